@@ -1,22 +1,48 @@
 # ============================================
 # Flask Backend für Dashboard
-# CSV Upload + PySpark Analyse
+# CSV Upload + Polars Analyse
 # ============================================
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Request, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
+from flask_compress import Compress
+from werkzeug.exceptions import HTTPException
 import os
+import re
 import sys  # NEU: für sys.executable
-import json
-import subprocess
-import tempfile
+import uuid
+import orjson
 import shutil
+import tempfile
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 
+from simple_analyzer import analyze_csv, warmup
+
 # Frontend-Pfad anpassen (liegt jetzt in ../frontend/dist)
 FRONTEND_DIST = os.path.join(os.path.dirname(__file__), '..', 'frontend', 'dist')
 
-app = Flask(__name__, static_folder=FRONTEND_DIST, static_url_path='')
+# Vite-Assets mit Content-Hash im Namen (assets/index-BxY3z9Ab.js) ändern sich nie
+# (send_static_file übergibt den relativen Namen, daher auch am Anfang erlaubt)
+HASHED_ASSET_PATTERN = re.compile(r'(?:^|[\\/])assets[\\/][^\\/]+-[A-Za-z0-9_-]{8,}\.\w+$')
+ASSET_MAX_AGE = 31536000  # 1 Jahr
+
+
+class DashboardFlask(Flask):
+    """Flask mit Cache-Headern für das gebaute React-Bundle"""
+
+    def get_send_file_max_age(self, filename):
+        # Gehashte Assets lange cachen, index.html und data.json immer revalidieren
+        if filename and HASHED_ASSET_PATTERN.search(filename):
+            return ASSET_MAX_AGE
+        return 0
+
+
+app = DashboardFlask(__name__, static_folder=FRONTEND_DIST, static_url_path='')
 
 # CORS konfigurieren - Frontend URLs erlauben
 CORS(app, resources={
@@ -29,18 +55,256 @@ CORS(app, resources={
     }
 })
 
+# JSON-Responses komprimieren (Brotli bevorzugt, sonst gzip)
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 1024
+Compress(app)
+
 # Konfiguration
 UPLOAD_FOLDER = 'uploads'
 DATA_FILE = 'data.json'
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_FILE_PATH = os.path.join(SCRIPT_DIR, DATA_FILE)
-PYSPARK_SCRIPT = os.path.join(SCRIPT_DIR, 'generate_dashboard_data.py')
 SIMPLE_ANALYZER = os.path.join(SCRIPT_DIR, 'simple_analyzer.py')
 
 # Uploads-Ordner mit absolutem Pfad
 UPLOAD_FOLDER_PATH = os.path.join(SCRIPT_DIR, UPLOAD_FOLDER)
 os.makedirs(UPLOAD_FOLDER_PATH, exist_ok=True)
 
+# Job-Ergebnisse liegen auf Platte, damit jeder Gunicorn-Worker den Status kennt
+JOBS_FOLDER_PATH = os.path.join(SCRIPT_DIR, 'jobs')
+os.makedirs(JOBS_FOLDER_PATH, exist_ok=True)
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_HOURS', 24)) * 3600
+
+# Maximale Laufzeit eines Jobs ab Upload (10 Minuten wie bisher)
+ANALYSE_TIMEOUT_SECONDS = int(os.environ.get('ANALYSE_TIMEOUT_SECONDS', 600))
+JOB_TIMEOUT_MESSAGE = f'Timeout: Die Analyse hat länger als {ANALYSE_TIMEOUT_SECONDS} Sekunden gedauert'
+UPLOAD_CLEANUP_GRACE_SECONDS = 60
+
+# Startzeit des Servers - gunicorn.conf.py setzt sie im Master, Worker erben sie
+SERVER_STARTED_AT = float(os.environ.setdefault('SERVER_STARTED_AT', str(time.time())))
+
+# Upload-Limit (Standard 2 GB)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 2048)) * 1024 * 1024
+UPLOAD_SPOOL_THRESHOLD = 500 * 1024  # wie Werkzeug: kleine Uploads im RAM
+
+
+class UploadRequest(Request):
+    """Request, der große Uploads direkt im uploads-Ordner puffert statt in /tmp"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= UPLOAD_SPOOL_THRESHOLD:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return tempfile.NamedTemporaryFile('wb+', dir=UPLOAD_FOLDER_PATH, suffix='.part')
+
+
+app.request_class = UploadRequest
+
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Analyse läuft im Hintergrund in einem eigenen Prozess (kein GIL-Konflikt mit
+# Polars' Thread-Pool). 'spawn' statt 'fork': Polars kann nach fork() hängen.
+ANALYSE_CONTEXT = multiprocessing.get_context('spawn')
+analyse_pool = ProcessPoolExecutor(max_workers=1, mp_context=ANALYSE_CONTEXT)
+analyse_pool_lock = threading.Lock()
+
+
+def warm_up_analyzer():
+    """Analyse-Prozess vorab starten und Polars darin aufwärmen
+
+    Wird beim Start aufgerufen (__main__ bzw. gunicorn.conf.py), damit der
+    erste Upload weder den Prozessstart noch den Polars-Import bezahlt.
+    """
+    analyse_pool.submit(warmup)
+
+
+def save_upload(file, filepath):
+    """Upload speichern - ohne zweite Kopie, wenn er schon im uploads-Ordner liegt
+
+    Der Job läuft länger als der Request, daher muss die CSV auf Platte bleiben.
+    """
+    spool_path = getattr(file.stream, 'name', None)
+    if isinstance(spool_path, str) and os.path.dirname(spool_path) == UPLOAD_FOLDER_PATH:
+        # Puffer-Datei per Hardlink übernehmen (wird beim Schließen nur entlinkt)
+        file.stream.flush()
+        try:
+            os.link(spool_path, filepath)
+            return
+        except OSError as e:
+            # Dateisystem ohne Hardlinks (EPERM/EXDEV/ENOTSUP) - normal kopieren
+            print(f"[WARN] Hardlink nicht möglich ({e}) - kopiere Upload")
+            file.stream.seek(0)
+
+    with open(filepath, 'wb') as f:
+        shutil.copyfileobj(file.stream, f, length=UPLOAD_CHUNK_SIZE)
+
+
+def job_path(job_id, suffix):
+    """Pfad einer Job-Datei (<job_id>.json = Ergebnis, <job_id>.error = Fehler)"""
+    return os.path.join(JOBS_FOLDER_PATH, f'{job_id}.{suffix}')
+
+
+def job_deadline(filepath):
+    """Zeitpunkt, bis zu dem ein Job fertig sein muss (Upload-Zeit der CSV + Timeout)"""
+    return os.path.getmtime(filepath) + ANALYSE_TIMEOUT_SECONDS
+
+
+def write_job_error(job_id, message):
+    """Fehler eines Jobs festhalten (der erste Fehler gewinnt)"""
+    if os.path.exists(job_path(job_id, 'error')):
+        return
+    with open(job_path(job_id, 'error'), 'w', encoding='utf-8') as f:
+        f.write(message)
+
+
+def submit_analysis(job_id, filepath, retried=False):
+    """Analyse-Job starten; ein abgestürzter Worker (z.B. OOM) wird ersetzt"""
+    global analyse_pool
+    with analyse_pool_lock:
+        try:
+            future = analyse_pool.submit(analyze_csv, filepath, job_path(job_id, 'json'))
+        except BrokenProcessPool:
+            analyse_pool = ProcessPoolExecutor(max_workers=1, mp_context=ANALYSE_CONTEXT)
+            future = analyse_pool.submit(analyze_csv, filepath, job_path(job_id, 'json'))
+        pool = analyse_pool
+
+    # Deadline überwachen - eine hängende Analyse blockiert sonst alle folgenden Jobs
+    timer = threading.Timer(
+        max(0, job_deadline(filepath) - time.time()),
+        expire_job, args=(job_id, future, pool)
+    )
+    timer.daemon = True
+    timer.start()
+
+    future.add_done_callback(lambda f: timer.cancel())
+    future.add_done_callback(lambda f: finish_job(job_id, filepath, f, retried))
+
+
+def expire_job(job_id, future, pool):
+    """Deadline überschritten: Fehler festhalten und den Analyse-Prozess beenden"""
+    if future.done():
+        return
+    print(f"[WARN] Job {job_id} überschreitet {ANALYSE_TIMEOUT_SECONDS}s - Analyse-Prozess wird beendet")
+    write_job_error(job_id, JOB_TIMEOUT_MESSAGE)
+    reset_pool(pool)
+
+
+def reset_pool(pool):
+    """Pool durch einen neuen ersetzen und seine Prozesse hart beenden
+
+    shutdown() allein würde auf die laufende Analyse warten. Wartende Jobs des
+    alten Pools enden mit BrokenProcessPool und werden in finish_job neu gestartet.
+    """
+    global analyse_pool
+    with analyse_pool_lock:
+        if analyse_pool is pool:
+            analyse_pool = ProcessPoolExecutor(max_workers=1, mp_context=ANALYSE_CONTEXT)
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False)
+
+
+def finish_job(job_id, filepath, future, retried=False):
+    """Job abschließen: data.json veröffentlichen oder Fehler festhalten"""
+    try:
+        future.result()
+        # Atomar ersetzen, damit /api/data nie eine halb geschriebene Datei liefert
+        tmp_path = f'{DATA_FILE_PATH}.{job_id}.tmp'
+        shutil.copyfile(job_path(job_id, 'json'), tmp_path)
+        os.replace(tmp_path, DATA_FILE_PATH)
+        print(f"[INFO] Job {job_id} fertig: {DATA_FILE_PATH}")
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool) and retry_job(job_id, filepath, retried):
+            return
+        print(f"[WARN] Job {job_id} fehlgeschlagen: {e}")
+        write_job_error(job_id, str(e) or type(e).__name__)
+    remove_upload(filepath)
+
+
+def retry_job(job_id, filepath, retried):
+    """Job einmal neu starten, wenn sein Pool wegen eines anderen Jobs beendet wurde"""
+    try:
+        if retried or os.path.exists(job_path(job_id, 'error')) or time.time() >= job_deadline(filepath):
+            return False
+        submit_analysis(job_id, filepath, retried=True)
+        print(f"[WARN] Job {job_id}: Analyse-Prozess beendet - neuer Versuch")
+        return True
+    except Exception as e:
+        print(f"[WARN] Job {job_id} konnte nicht neu gestartet werden: {e}")
+        return False
+
+
+def remove_upload(filepath):
+    """CSV eines Jobs löschen - erst zum Schluss, solange sie existiert gilt der Job als laufend"""
+    try:
+        os.remove(filepath)
+        print(f"[INFO] CSV gelöscht: {filepath}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[WARN] CSV konnte nicht gelöscht werden: {e}")
+
+
+def prune_jobs():
+    """Alte Job-Dateien löschen und Uploads weit nach ihrer Deadline aufräumen
+
+    Job-Ergebnisse/-Fehler bleiben JOB_RETENTION_SECONDS liegen. CSVs und .part-Puffer,
+    die älter als die Deadline (plus Puffer für den Timer des eigenen Workers) sind,
+    stammen von gestorbenen oder recycelten Workern.
+    """
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for entry in os.scandir(JOBS_FOLDER_PATH):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                print(f"[INFO] Alte Job-Datei gelöscht: {entry.name}")
+        except FileNotFoundError:
+            pass  # parallel von einem anderen Worker gelöscht
+        except Exception as e:
+            print(f"[WARN] Job-Datei konnte nicht gelöscht werden: {e}")
+
+    clean_uploads(time.time() - ANALYSE_TIMEOUT_SECONDS - UPLOAD_CLEANUP_GRACE_SECONDS, JOB_TIMEOUT_MESSAGE)
+
+
+def mark_orphaned_jobs():
+    """CSVs aus der Zeit vor dem Serverstart als abgebrochene Jobs markieren
+
+    Stirbt ein Worker vor finish_job, bliebe uploads/<job_id>.csv liegen und der
+    Job stünde für immer auf 'running'. Jobs laufen nie über einen Neustart hinaus.
+    """
+    clean_uploads(SERVER_STARTED_AT, 'Analyse abgebrochen (Server-Neustart)')
+
+
+def clean_uploads(cutoff, message):
+    """Job-CSVs und .part-Puffer älter als cutoff löschen, Jobs mit message als Fehler markieren"""
+    for entry in os.scandir(UPLOAD_FOLDER_PATH):
+        name, ext = os.path.splitext(entry.name)
+        try:
+            if entry.stat().st_mtime >= cutoff:
+                continue
+            if ext == '.csv' and JOB_ID_PATTERN.fullmatch(name):
+                write_job_error(name, message)
+                os.remove(entry.path)
+                print(f"[INFO] Abgebrochener Job markiert: {name}")
+            elif ext == '.part':
+                os.remove(entry.path)  # Upload-Puffer eines abgebrochenen Requests
+        except FileNotFoundError:
+            pass  # parallel von einem anderen Worker erledigt
+        except Exception as e:
+            print(f"[WARN] Upload-Datei konnte nicht aufgeräumt werden: {e}")
+
+
+def matching_etag(etag):
+    """ETag aus If-None-Match, der zu etag passt (auch mit Suffix von Flask-Compress)"""
+    candidates = [etag] + [f'{etag}:{algorithm}' for algorithm in app.config['COMPRESS_ALGORITHM']]
+    return next((tag for tag in candidates if request.if_none_match.contains(tag)), None)
+
+
+def orjson_response(data):
+    """JSON-Response mit orjson statt jsonify (schneller bei großen Payloads)"""
+    return app.response_class(orjson.dumps(data), mimetype='application/json')
+
 
 @app.route('/')
 def serve_dashboard():
@@ -69,88 +333,92 @@ def upload_csv():
         if not file.filename.endswith('.csv'):
             return jsonify({'error': 'Nur CSV-Dateien erlaubt'}), 400
 
-        # Speichere CSV temporär (mit absolutem Pfad)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'ecommerce_{timestamp}.csv'
-        filepath = os.path.join(UPLOAD_FOLDER_PATH, filename)
-        file.save(filepath)
+        # Speichere CSV für den Hintergrund-Job (mit absolutem Pfad)
+        job_id = uuid.uuid4().hex
+        filepath = os.path.join(UPLOAD_FOLDER_PATH, f'{job_id}.csv')
+        save_upload(file, filepath)
+        os.utime(filepath)  # mtime = Startzeit des Jobs (Basis der Deadline)
 
         print(f"[INFO] CSV gespeichert: {filepath}")
-        print(f"[INFO] Starte Analyse mit: {sys.executable}")
-        print(f"[INFO] Script: {SIMPLE_ANALYZER}")
-        print(f"[INFO] Output: {DATA_FILE_PATH}")
-
-        # FIX: Nutze sys.executable für korrekten Python-Pfad im venv
-        # FIX: Übergebe Output-Pfad als Argument
-        result = subprocess.run(
-            [sys.executable, SIMPLE_ANALYZER, filepath, DATA_FILE_PATH],
-            capture_output=True,
-            text=True,
-            timeout=600,  # 10 Minuten Timeout
-            cwd=SCRIPT_DIR  # FIX: Arbeitsverzeichnis setzen
-        )
-
-        print(f"[INFO] Subprocess returncode: {result.returncode}")
-        if result.stdout:
-            print(f"[INFO] Subprocess stdout: {result.stdout}")
-        if result.stderr:
-            print(f"[WARN] Subprocess stderr: {result.stderr}")
-
-        if result.returncode != 0:
-            return jsonify({
-                'error': 'Fehler bei CSV-Analyse',
-                'details': result.stderr,
-                'stdout': result.stdout
-            }), 500
-
-        # Prüfe ob data.json erstellt wurde
-        if not os.path.exists(DATA_FILE_PATH):
-            return jsonify({
-                'error': 'Analyse abgeschlossen, aber data.json nicht gefunden',
-                'expected_path': DATA_FILE_PATH
-            }), 500
+        print(f"[INFO] Starte Analyse-Job: {job_id}")
 
-        # Lade generierte Daten
-        with open(DATA_FILE_PATH, 'r', encoding='utf-8') as f:
-            dashboard_data = json.load(f)
-
-        # Cleanup: CSV löschen um Speicher zu sparen (optional)
         try:
-            os.remove(filepath)
-            print(f"[INFO] CSV gelöscht: {filepath}")
-        except Exception as e:
-            print(f"[WARN] CSV konnte nicht gelöscht werden: {e}")
+            prune_jobs()
+            submit_analysis(job_id, filepath)
+        except Exception:
+            # Job-ID kennt niemand - CSV nicht verwaist liegen lassen
+            remove_upload(filepath)
+            raise
 
         return jsonify({
             'success': True,
-            'message': 'Daten erfolgreich analysiert',
-            'filename': filename,
-            'data': dashboard_data
-        })
-
-    except subprocess.TimeoutExpired:
-        return jsonify({
-            'error': 'Timeout bei CSV-Analyse',
-            'message': 'Die Analyse hat zu lange gedauert (>10 Minuten)'
-        }), 500
+            'message': 'Analyse gestartet',
+            'filename': file.filename,
+            'job_id': job_id,
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
+
+    except HTTPException as e:
+        # z.B. 413 bei Überschreitung von MAX_CONTENT_LENGTH - Statuscode beibehalten
+        print(f"[WARN] Upload abgelehnt: {e}")
+        return jsonify({'error': e.description}), e.code
     except Exception as e:
         print(f"[ERROR] Upload fehlgeschlagen: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Status eines Analyse-Jobs: running, done (mit Daten) oder error"""
+    if not JOB_ID_PATTERN.fullmatch(job_id):
+        return jsonify({'error': 'Unbekannter Job'}), 404
+
+    try:
+        # Reihenfolge wichtig: die CSV wird erst nach Ergebnis/Fehler gelöscht
+        filepath = os.path.join(UPLOAD_FOLDER_PATH, f'{job_id}.csv')
+        try:
+            if time.time() < job_deadline(filepath):
+                return jsonify({'job_id': job_id, 'status': 'running'})
+            # Deadline überschritten (z.B. Worker gestorben) - nicht mehr als laufend melden
+            write_job_error(job_id, JOB_TIMEOUT_MESSAGE)
+        except FileNotFoundError:
+            pass
+
+        if os.path.exists(job_path(job_id, 'json')):
+            with open(job_path(job_id, 'json'), 'rb') as f:
+                data = orjson.loads(f.read())
+            return orjson_response({'job_id': job_id, 'status': 'done', 'data': data})
+
+        if os.path.exists(job_path(job_id, 'error')):
+            with open(job_path(job_id, 'error'), 'r', encoding='utf-8') as f:
+                details = f.read()
+            return jsonify({
+                'job_id': job_id,
+                'status': 'error',
+                'error': 'Fehler bei CSV-Analyse',
+                'details': details
+            })
+
+        return jsonify({'error': 'Unbekannter Job'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/data', methods=['GET'])
 def get_dashboard_data():
-    """Aktuelle Dashboard-Daten abrufen"""
+    """Aktuelle Dashboard-Daten abrufen (ETag: 304 wenn unverändert)"""
     try:
-        if not os.path.exists(DATA_FILE_PATH):
-            return jsonify({
-                'error': 'Keine Daten vorhanden',
-                'message': 'Bitte laden Sie zuerst eine CSV-Datei hoch'
-            }), 404
+        # ETag aus mtime + Größe - data.json wird weder gelesen noch geparst
+        stat = os.stat(DATA_FILE_PATH)
+        etag = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
 
-        with open(DATA_FILE_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return jsonify(data)
+        matched = matching_etag(etag)
+        if matched:
+            response = app.response_class(status=304)
+            response.set_etag(matched)
+            return response
+
+        return send_file(DATA_FILE_PATH, mimetype='application/json', etag=etag)
     except FileNotFoundError:
         return jsonify({
             'error': 'Keine Daten vorhanden',
@@ -180,33 +448,6 @@ def health_check():
     return jsonify({'status': 'healthy'}), 200
 
 
-def create_temp_pyspark_script(csv_path):
-    """Erstelle temporäres PySpark-Script mit dynamischem CSV-Pfad"""
-
-    # Lade Original-Script
-    with open(PYSPARK_SCRIPT, 'r', encoding='utf-8') as f:
-        original_script = f.read()
-
-    # Ersetze DATA_PATH mit neuem Pfad
-    modified_script = original_script.replace(
-        'DATA_PATH = "C:/Users/sebas/PycharmProjects/BigData/daten/ecommerce_5m.csv"',
-        f'DATA_PATH = "{csv_path}"'
-    )
-
-    # Ändere auch den Output-Pfad für data.json
-    modified_script = modified_script.replace(
-        './ergebnisse/',
-        f'{SCRIPT_DIR}/'
-    )
-
-    # Speichere temporäres Script
-    temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8')
-    temp_file.write(modified_script)
-    temp_file.close()
-
-    return temp_file.name
-
-
 if __name__ == '__main__':
     print("=" * 60)
     print("   KUNDEN-ANALYSE DASHBOARD - SERVER")
@@ -225,4 +466,11 @@ if __name__ == '__main__':
     print("=" * 60)
     print()
 
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Nur für lokale Entwicklung - Produktion läuft über gunicorn (gthread)
+    debug = os.environ.get('FLASK_DEBUG', '1') == '1'
+
+    # Mit Reloader läuft __main__ auch im Überwachungsprozess - dort nicht aufwärmen
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        mark_orphaned_jobs()
+        warm_up_analyzer()
+    app.run(host='0.0.0.0', port=5000, debug=debug, threaded=True)
\ No newline at end of file
@@ -27,6 +27,8 @@ spark = SparkSession.builder \
     .appName("Kunden Dashboard - React Integration") \
     .master("local[*]") \
     .config("spark.driver.memory", "4g") \
+    .config("spark.sql.execution.arrow.pyspark.enabled", "true") \
+    .config("spark.sql.execution.arrow.pyspark.fallback.enabled", "true") \
     .getOrCreate()
 
 spark.sparkContext.setLogLevel("WARN")
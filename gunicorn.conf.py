@@ -0,0 +1,16 @@
+# Gunicorn Config - wird automatisch aus dem Arbeitsverzeichnis geladen
+
+import os
+import time
+
+
+def on_starting(server):
+    """Startzeit im Master festhalten - Worker räumen nur ältere Upload-Reste auf"""
+    os.environ['SERVER_STARTED_AT'] = str(time.time())
+
+
+def post_worker_init(worker):
+    """Upload-Reste von vor dem Serverstart aufräumen und Analyse-Prozess vorab starten"""
+    from backend_server import mark_orphaned_jobs, warm_up_analyzer
+    mark_orphaned_jobs()
+    warm_up_analyzer()
@@ -4,64 +4,271 @@
 # ============================================
 
 import polars as pl
-import json
+import orjson
 import os
+import re
 import sys
 from datetime import datetime
 
 # DACH-Länder Definition
 DACH_COUNTRIES = ["Germany", "Austria", "Switzerland"]
 
+# Feste Typen für die benötigten Spalten (keine Typ-Inferenz über die Datei).
+# IDs werden als Text gelesen und im Query-Plan auf den schmalsten passenden
+# Integer-Typ gecastet (siehe ID_TYPE_CANDIDATES); 'total' bleibt Float64, da
+# Float32 schon beim Parsen Cent-Beträge rundet. 'date' wird als Text gelesen und
+# im Query-Plan geparst; 'country' hat nur wenige Werte und wird als Categorical
+# gelesen (group_by/is_in auf Integer-Codes).
+CSV_SCHEMA = {
+    'customer_id': pl.Utf8,
+    'transaction_id': pl.Utf8,
+    'total': pl.Float64,
+    'date': pl.Utf8,
+    'country': pl.Categorical
+}
+
+# ID-Typen vom schmalsten zum breitesten - passt keiner (z.B. 'C001', 'T1'
+# oder '1.0'), bleibt die Spalte Text. Int32 halbiert den Speicherdurchsatz.
+ID_COLUMNS = ['customer_id', 'transaction_id']
+ID_TYPE_CANDIDATES = [pl.Int32, pl.Int64]
+
+# Ab dieser Dateigröße liest Polars die CSV speichersparend (low_memory)
+LOW_MEMORY_THRESHOLD_MB = 512
+
+
+def warmup():
+    """Polars-Thread-Pool und Kernels einmal anwerfen, damit der erste Upload nicht bremst"""
+    df = pl.DataFrame({'customer_id': [1, 1, 2], 'total': [1.0, 2.0, 3.0]})
+    result = df.lazy().group_by('customer_id').agg(pl.col('total').sum()).collect(streaming=True)
+    orjson.dumps(result.to_dicts())
+
+
+def id_check_name(column, dtype):
+    """Spaltenname der Prüfung 'Werte, die nicht in dtype passen' im Meta-Ergebnis"""
+    return f'{column}_kein_{dtype}'
+
+
+def fitted_id_types(meta):
+    """Schmalster ID-Typ je Spalte, der alle Werte aufnimmt (sonst Utf8)"""
+    return {
+        col: next((dtype for dtype in ID_TYPE_CANDIDATES if meta[id_check_name(col, dtype)][0] == 0), pl.Utf8)
+        for col in ID_COLUMNS
+    }
+
+
+def scan_source(source, columns, low_memory):
+    """Typisierte LazyFrame über die CSV (nur benötigte Spalten, Datum geparst)"""
+    # Nur die benötigten Spalten lesen (Projection Pushdown in den CSV-Reader)
+    used_columns = [col for col in CSV_SCHEMA if col in columns]
+    return pl.scan_csv(
+        source,
+        schema_overrides={col: CSV_SCHEMA[col] for col in used_columns},
+        low_memory=low_memory
+    ).select(used_columns).with_columns(
+        pl.col('date').str.to_datetime(format=None, strict=False).alias('date')
+    )
+
+
+def parsed_cache_path(csv_path):
+    """Pfad der Arrow-IPC-Datei mit den geparsten Spalten (Schlüssel: mtime + Größe)"""
+    stat = os.stat(csv_path)
+    return f"{csv_path}.{stat.st_mtime_ns:x}-{stat.st_size:x}.arrow"
+
+
+def load_source(source, columns, low_memory, cache_path=None):
+    """LazyFrame über die Quelle - mit cache_path wird die geparste CSV als IPC abgelegt"""
+    lf = scan_source(source, columns, low_memory)
+    if cache_path is None:
+        return lf
+
+    # Erst vollständig schreiben, dann umbenennen (kein halber Cache nach Abbruch)
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        lf.sink_ipc(tmp_path)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    print(f"[ANALYZER] Cache geschrieben: {cache_path}")
+    prune_parsed_caches(source, cache_path)
+    return pl.scan_ipc(cache_path, memory_map=True)
+
+
+def prune_parsed_caches(csv_path, keep_path):
+    """Veraltete Cache-Dateien derselben CSV löschen (andere mtime/Größe)"""
+    directory = os.path.dirname(csv_path) or '.'
+    pattern = re.compile(re.escape(os.path.basename(csv_path)) + r'\.[0-9a-f]+-[0-9a-f]+\.arrow')
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if pattern.fullmatch(name) and name != os.path.basename(keep_path):
+            try:
+                os.remove(path)
+                print(f"[ANALYZER] Alter Cache gelöscht: {path}")
+            except OSError as e:
+                print(f"[WARN] Alter Cache konnte nicht gelöscht werden: {e}")
+
+
+def write_json_sections(f, data):
+    """dict abschnittsweise als JSON schreiben (ein Schlüssel pro Zeile, Bytes zurück)
+
+    Jeder Abschnitt wird einzeln serialisiert und sofort geschrieben - es liegt
+    nie das komplette JSON-Dokument als ein Bytes-Objekt im Speicher.
+    """
+    option = orjson.OPT_SERIALIZE_NUMPY
+    written = f.write(b'{\n')
+    last = len(data) - 1
+    for i, (key, value) in enumerate(data.items()):
+        written += f.write(b'  ' + orjson.dumps(key) + b': ' + orjson.dumps(value, option=option))
+        written += f.write(b',\n' if i < last else b'\n')
+    written += f.write(b'}\n')
+    return written
+
+
+def build_query_plan(lf, columns, id_types):
+    """LazyFrames für alle Aggregationen über die Quelle (gemeinsam mit collect_all ausführen)
+
+    id_types legt den Typ der ID-Spalten fest. Das Meta-Ergebnis zählt zusätzlich je
+    Kandidat die Werte, die beim Cast zu null würden (Basis für fitted_id_types).
+    """
+    id_checks = [
+        (pl.col(col).is_not_null() & pl.col(col).cast(dtype, strict=False).is_null())
+        .sum().alias(id_check_name(col, dtype))
+        for col in ID_COLUMNS for dtype in ID_TYPE_CANDIDATES
+    ]
+    meta_lf = lf.select([pl.len().alias('zeilen'), *id_checks])
+
+    lf = lf.with_columns([pl.col(col).cast(id_types[col], strict=False) for col in ID_COLUMNS])
+
+    kunden_aggs = [
+        pl.col('transaction_id').count().alias('anzahl_bestellungen'),
+        pl.col('total').sum().alias('gesamt_umsatz'),
+        pl.col('total').mean().alias('durchschnitt_bestellung'),
+        pl.col('date').max().alias('letzte_bestellung')
+    ]
+    if 'country' in columns:
+        # DACH-Kunde = mindestens eine Bestellung aus DACH (im selben group_by)
+        kunden_aggs.append(pl.col('country').is_in(DACH_COUNTRIES).any().alias('ist_dach_kunde'))
+
+    # Tage seit letzter Bestellung relativ zum jüngsten Datum (broadcast max im selben Plan)
+    # Umsatz-Segment: VIP = 90. Perzentil (broadcast quantile), danach feste Schwellen
+    kunden_umsatz_lf = lf.group_by('customer_id').agg(kunden_aggs).with_columns(
+        (pl.col('letzte_bestellung').max() - pl.col('letzte_bestellung')).dt.total_days().alias('tage_inaktiv'),
+        pl.when(pl.col('gesamt_umsatz') >= pl.col('gesamt_umsatz').quantile(0.9)).then(pl.lit('VIP'))
+        .when(pl.col('gesamt_umsatz') >= 1000).then(pl.lit('Premium'))
+        .when(pl.col('gesamt_umsatz') >= 200).then(pl.lit('Standard'))
+        .otherwise(pl.lit('Gering'))
+        .alias('umsatz_segment')
+    ).with_columns(
+        # Aktivitäts-Segment (null = kein Datum, kein Segment)
+        pl.when(pl.col('tage_inaktiv') <= 30).then(pl.lit('Aktiv'))
+        .when(pl.col('tage_inaktiv') <= 90).then(pl.lit('Inaktiv'))
+        .when(pl.col('tage_inaktiv') > 90).then(pl.lit('Verloren'))
+        .alias('aktivitaet_segment')
+    )
+
+    lazy_frames = [meta_lf, kunden_umsatz_lf]
+
+    if 'country' in columns:
+        # Länder-Details (DACH-Markierung auf dem kleinen Ergebnis statt Filter über alle Zeilen)
+        laender_stats_lf = lf.group_by('country').agg([
+            pl.col('transaction_id').count().alias('anzahl_bestellungen'),
+            pl.col('total').sum().alias('gesamt_umsatz'),
+            pl.col('total').mean().alias('avg_bestellung')
+        ]).with_columns(
+            pl.col('country').is_in(DACH_COUNTRIES).fill_null(False).alias('is_dach')
+        ).sort('gesamt_umsatz', descending=True)
+
+        lazy_frames.append(laender_stats_lf)
 
-def analyze_csv(csv_path, output_path='data.json'):
-    """CSV-Analyse mit Polars - exakt wie PySpark Original"""
+    return lazy_frames
+
+
+def analyze_csv(source, output_path='data.json', cache=False):
+    """CSV-Analyse mit Polars - exakt wie PySpark Original
+
+    source ist ein Dateipfad oder ein datei-ähnliches Objekt (z.B. Upload-Stream).
+    Gibt die Dashboard-Daten als dict zurück. Mit output_path=None wird
+    keine data.json geschrieben (Aufrufer hält das dict bereits).
+    Mit cache=True wird die geparste CSV neben der Datei als Arrow-IPC
+    abgelegt; weitere Läufe auf derselben Datei überspringen das CSV-Parsen.
+    """
 
     print(f"[ANALYZER] Start: {datetime.now().isoformat()}")
-    print(f"[ANALYZER] CSV-Pfad: {csv_path}")
+    print(f"[ANALYZER] Quelle: {source}")
     print(f"[ANALYZER] Output-Pfad: {output_path}")
 
-    # Prüfe ob CSV existiert
-    if not os.path.exists(csv_path):
-        print(f"[ERROR] CSV nicht gefunden: {csv_path}")
-        sys.exit(1)
+    if isinstance(source, (str, os.PathLike)):
+        # Prüfe ob CSV existiert
+        if not os.path.exists(source):
+            print(f"[ERROR] CSV nicht gefunden: {source}")
+            raise FileNotFoundError(f"CSV nicht gefunden: {source}")
+        file_size = os.path.getsize(source)
+        cache_path = parsed_cache_path(source) if cache else None
+        streaming = True
+    else:
+        # Stream einmal lesen - Polars scannt die Bytes direkt aus dem Speicher.
+        # Die Streaming-Engine kann keine In-Memory-Puffer scannen, daher normal sammeln.
+        source = source.read()
+        file_size = len(source)
+        cache_path = None
+        streaming = False
 
     # Dateigröße loggen
-    file_size_mb = os.path.getsize(csv_path) / (1024 * 1024)
+    file_size_mb = file_size / (1024 * 1024)
     print(f"[ANALYZER] Dateigröße: {file_size_mb:.2f} MB")
 
-    print(f"[ANALYZER] Lade CSV mit Polars...")
+    print(f"[ANALYZER] Lade CSV mit Polars (lazy)...")
     try:
-        df = pl.read_csv(csv_path, try_parse_dates=True)
+        # Nur Header lesen, alle Spalten als Text (keine Inferenz)
+        columns = pl.scan_csv(source, infer_schema=False).collect_schema().names()
     except Exception as e:
         print(f"[ERROR] CSV konnte nicht geladen werden: {e}")
-        sys.exit(1)
+        raise
 
-    print(f"[ANALYZER] Geladen: {len(df)} Zeilen, {len(df.columns)} Spalten")
-    print(f"[ANALYZER] Spalten: {df.columns}")
+    print(f"[ANALYZER] Spalten: {columns}")
 
     # Validiere benötigte Spalten
     required_columns = ['customer_id', 'transaction_id', 'total', 'date']
-    missing_columns = [col for col in required_columns if col not in df.columns]
+    missing_columns = [col for col in required_columns if col not in columns]
     if missing_columns:
         print(f"[ERROR] Fehlende Spalten: {missing_columns}")
-        sys.exit(1)
+        raise ValueError(f"Fehlende Spalten: {missing_columns}")
 
-    # Konvertiere date-Spalte falls nötig
-    if df['date'].dtype == pl.Utf8:
-        df = df.with_columns(
-            pl.col('date').str.to_datetime(format=None, strict=False).alias('date')
-        )
+    low_memory = file_size_mb >= LOW_MEMORY_THRESHOLD_MB
+    has_country = 'country' in columns
 
     # ============================================
-    # KUNDEN-UMSATZ AGGREGIEREN
+    # QUERY-PLAN (ein gemeinsamer Durchlauf über die CSV)
     # ============================================
-    print(f"[ANALYZER] Berechne Kunden-Umsatz...")
+    print(f"[ANALYZER] Berechne Aggregationen (Query-Plan)...")
 
-    kunden_umsatz = df.group_by('customer_id').agg([
-        pl.col('transaction_id').count().alias('anzahl_bestellungen'),
-        pl.col('total').sum().alias('gesamt_umsatz'),
-        pl.col('total').mean().alias('durchschnitt_bestellung')
-    ])
+    try:
+        # Gemeinsamer String-Cache, damit Categorical-Codes über alle Batches gleich sind
+        with pl.StringCache():
+            if cache_path is not None and os.path.exists(cache_path):
+                print(f"[ANALYZER] Lese geparste Daten aus Cache: {cache_path}")
+                lf = pl.scan_ipc(cache_path, memory_map=True)
+            else:
+                lf = load_source(source, columns, low_memory, cache_path)
+
+            # Erst mit Int32-IDs; passt eine ID-Spalte nicht, zweiter Durchlauf mit
+            # dem Typ, den die Null-Prüfung im ersten Durchlauf ermittelt hat
+            id_types = {col: ID_TYPE_CANDIDATES[0] for col in ID_COLUMNS}
+            results = pl.collect_all(build_query_plan(lf, columns, id_types), streaming=streaming)
+            fitted = fitted_id_types(results[0])
+            if fitted != id_types:
+                print(f"[WARN] ID-Spalten passen nicht in Int32 - zweiter Durchlauf mit {fitted}")
+                results = pl.collect_all(build_query_plan(lf, columns, fitted), streaming=streaming)
+    except Exception as e:
+        print(f"[ERROR] CSV konnte nicht verarbeitet werden: {e}")
+        raise
+
+    meta, kunden_umsatz = results[:2]
+    if has_country:
+        laender_stats = results[2]
+
+    print(f"[ANALYZER] Geladen: {meta['zeilen'][0]} Zeilen, {len(columns)} Spalten (low_memory={low_memory})")
 
     kunden_gesamt = len(kunden_umsatz)
     print(f"[ANALYZER] Kunden gefunden: {kunden_gesamt}")
@@ -71,37 +278,44 @@ def analyze_csv(csv_path, output_path='data.json'):
     # ============================================
     print(f"[ANALYZER] Berechne Umsatz-Segmente...")
 
-    # VIP-Schwelle = 90. Perzentil (Top 10% der Kunden)
-    vip_threshold = kunden_umsatz['gesamt_umsatz'].quantile(0.9)
+    # VIP-Schwelle = 90. Perzentil (Top 10% der Kunden) + Gesamtumsatz in einem Durchlauf
+    vip_threshold, total_umsatz = kunden_umsatz.select([
+        pl.col('gesamt_umsatz').quantile(0.9).alias('vip_threshold'),
+        pl.col('gesamt_umsatz').sum().alias('total_umsatz')
+    ]).row(0)
     print(f"[ANALYZER] VIP-Schwelle (90. Perzentil): {vip_threshold:,.2f} EUR")
 
-    # Segmente basierend auf Perzentilen
-    vip_df = kunden_umsatz.filter(pl.col('gesamt_umsatz') >= vip_threshold)
-    premium_df = kunden_umsatz.filter((pl.col('gesamt_umsatz') >= 1000) & (pl.col('gesamt_umsatz') < vip_threshold))
-    standard_df = kunden_umsatz.filter((pl.col('gesamt_umsatz') >= 200) & (pl.col('gesamt_umsatz') < 1000))
-    gering_df = kunden_umsatz.filter(pl.col('gesamt_umsatz') < 200)
-
-    # Gesamtumsatz für Prozentberechnung
-    total_umsatz = float(kunden_umsatz['gesamt_umsatz'].sum())
+    # Segment-Label kommt bereits aus dem Query-Plan (ein group_by statt vier Filter)
+    segment_stats = {
+        row['umsatz_segment']: row
+        for row in kunden_umsatz.group_by('umsatz_segment').agg([
+            pl.len().alias('anzahl_kunden'),
+            pl.col('gesamt_umsatz').sum().alias('segment_umsatz'),
+            pl.col('gesamt_umsatz').mean().alias('avg_umsatz')
+        ]).to_dicts()
+    }
 
     report_umsatz = []
-    for segment_name, segment_df in [('VIP', vip_df), ('Premium', premium_df), ('Standard', standard_df), ('Gering', gering_df)]:
+    for segment_name in ['VIP', 'Premium', 'Standard', 'Gering']:
         # Alle Segmente anzeigen, auch wenn leer
-        if len(segment_df) > 0:
-            segment_umsatz = float(segment_df['gesamt_umsatz'].sum())
-            avg_umsatz = float(segment_df['gesamt_umsatz'].mean())
+        stats = segment_stats.get(segment_name)
+        if stats:
+            anzahl_kunden = stats['anzahl_kunden']
+            segment_umsatz = stats['segment_umsatz']
+            avg_umsatz = stats['avg_umsatz']
         else:
+            anzahl_kunden = 0
             segment_umsatz = 0.0
             avg_umsatz = 0.0
 
         report_umsatz.append({
             'umsatz_segment': segment_name,
-            'anzahl_kunden': float(len(segment_df)),
+            'anzahl_kunden': float(anzahl_kunden),
             'segment_umsatz': round(segment_umsatz, 2),
             'avg_umsatz': round(avg_umsatz, 2),
             'umsatz_anteil_prozent': round((segment_umsatz / total_umsatz) * 100, 2) if total_umsatz > 0 else 0
         })
-        print(f"[ANALYZER]   {segment_name}: {len(segment_df)} Kunden, {segment_umsatz:,.2f} EUR")
+        print(f"[ANALYZER]   {segment_name}: {anzahl_kunden} Kunden, {segment_umsatz:,.2f} EUR")
 
     # Nach Umsatz sortieren (absteigend)
     report_umsatz.sort(key=lambda x: x['segment_umsatz'], reverse=True)
@@ -112,53 +326,37 @@ def analyze_csv(csv_path, output_path='data.json'):
     print(f"[ANALYZER] Berechne Aktivitäts-Segmente...")
 
     try:
-        max_date = df['date'].max()
+        max_date = kunden_umsatz['letzte_bestellung'].max()
         print(f"[ANALYZER] Max Datum: {max_date}")
 
-        # Letzte Bestellung pro Kunde
-        kunden_last_order = df.group_by('customer_id').agg([
-            pl.col('date').max().alias('letzte_bestellung')
-        ])
-
-        # Tage seit letzter Bestellung
-        kunden_last_order = kunden_last_order.with_columns(
-            ((max_date - pl.col('letzte_bestellung')).dt.total_days()).alias('tage_inaktiv')
-        )
-
-        # Segmente
-        aktiv = kunden_last_order.filter(pl.col('tage_inaktiv') <= 30)
-        inaktiv = kunden_last_order.filter((pl.col('tage_inaktiv') > 30) & (pl.col('tage_inaktiv') <= 90))
-        verloren = kunden_last_order.filter(pl.col('tage_inaktiv') > 90)
-
-        # Umsätze berechnen
-        aktiv_umsatz = float(kunden_umsatz.filter(pl.col('customer_id').is_in(aktiv['customer_id']))['gesamt_umsatz'].sum())
-        inaktiv_umsatz = float(kunden_umsatz.filter(pl.col('customer_id').is_in(inaktiv['customer_id']))['gesamt_umsatz'].sum())
-        verloren_umsatz = float(kunden_umsatz.filter(pl.col('customer_id').is_in(verloren['customer_id']))['gesamt_umsatz'].sum())
-
-        aktiv_count = len(aktiv)
-        inaktiv_count = len(inaktiv)
-        verloren_count = len(verloren)
-
-        report_aktivitaet = [
-            {
-                'aktivitaet_segment': 'Aktiv',
-                'anzahl_kunden': float(aktiv_count),
-                'segment_umsatz': round(aktiv_umsatz, 2),
-                'avg_umsatz': round(aktiv_umsatz / aktiv_count, 2) if aktiv_count > 0 else 0
-            },
-            {
-                'aktivitaet_segment': 'Inaktiv',
-                'anzahl_kunden': float(inaktiv_count),
-                'segment_umsatz': round(inaktiv_umsatz, 2),
-                'avg_umsatz': round(inaktiv_umsatz / inaktiv_count, 2) if inaktiv_count > 0 else 0
-            },
-            {
-                'aktivitaet_segment': 'Verloren',
-                'anzahl_kunden': float(verloren_count),
-                'segment_umsatz': round(verloren_umsatz, 2),
-                'avg_umsatz': round(verloren_umsatz / verloren_count, 2) if verloren_count > 0 else 0
-            }
-        ]
+        # Segment-Label kommt aus dem Query-Plan - ein group_by statt drei is_in-Filter
+        aktivitaet_stats = {
+            row['aktivitaet_segment']: row
+            for row in kunden_umsatz.group_by('aktivitaet_segment').agg([
+                pl.len().alias('anzahl_kunden'),
+                pl.col('gesamt_umsatz').sum().alias('segment_umsatz'),
+                pl.col('gesamt_umsatz').mean().alias('avg_umsatz')
+            ]).to_dicts()
+        }
+
+        report_aktivitaet = []
+        for segment_name in ['Aktiv', 'Inaktiv', 'Verloren']:
+            stats = aktivitaet_stats.get(segment_name)
+            if stats:
+                segment_count = stats['anzahl_kunden']
+                segment_umsatz = stats['segment_umsatz']
+                avg_umsatz = stats['avg_umsatz']
+            else:
+                segment_count = 0
+                segment_umsatz = 0.0
+                avg_umsatz = 0.0
+
+            report_aktivitaet.append({
+                'aktivitaet_segment': segment_name,
+                'anzahl_kunden': float(segment_count),
+                'segment_umsatz': round(segment_umsatz, 2),
+                'avg_umsatz': round(avg_umsatz, 2)
+            })
 
         # Nach Umsatz sortieren
         report_aktivitaet.sort(key=lambda x: x['segment_umsatz'], reverse=True)
@@ -169,7 +367,6 @@ def analyze_csv(csv_path, output_path='data.json'):
     except Exception as e:
         print(f"[WARN] Fehler bei Aktivitäts-Berechnung: {e}")
         report_aktivitaet = []
-        kunden_last_order = pl.DataFrame()
         max_date = datetime.now()
 
     # ============================================
@@ -181,53 +378,37 @@ def analyze_csv(csv_path, output_path='data.json'):
     report_dach_laender = []
     report_andere_laender = []
 
-    if 'country' in df.columns:
-        # Prüfe welche Kunden DACH-Bestellungen haben
-        dach_bestellungen = df.filter(pl.col('country').is_in(DACH_COUNTRIES))
-        dach_kunden_ids = dach_bestellungen['customer_id'].unique()
-
-        # DACH-Kunden Statistiken
-        dach_kunden = kunden_umsatz.filter(pl.col('customer_id').is_in(dach_kunden_ids))
-        nicht_dach_kunden = kunden_umsatz.filter(~pl.col('customer_id').is_in(dach_kunden_ids))
+    if has_country:
+        # DACH-Kunden Statistiken (ein group_by auf der Kunden-Markierung)
+        dach_stats = {
+            row['ist_dach_kunde']: row
+            for row in kunden_umsatz.group_by('ist_dach_kunde').agg([
+                pl.len().alias('anzahl_kunden'),
+                pl.col('gesamt_umsatz').sum().alias('gesamt_umsatz'),
+                pl.col('gesamt_umsatz').mean().alias('avg_umsatz')
+            ]).to_dicts()
+        }
 
         # Report DACH ja/nein
-        if len(dach_kunden) > 0:
-            report_dach.append({
-                'ist_dach_kunde': 'Ja',
-                'anzahl_kunden': float(len(dach_kunden)),
-                'gesamt_umsatz': round(float(dach_kunden['gesamt_umsatz'].sum()), 2),
-                'avg_umsatz': round(float(dach_kunden['gesamt_umsatz'].mean()), 2)
-            })
-
-        if len(nicht_dach_kunden) > 0:
-            report_dach.append({
-                'ist_dach_kunde': 'Nein',
-                'anzahl_kunden': float(len(nicht_dach_kunden)),
-                'gesamt_umsatz': round(float(nicht_dach_kunden['gesamt_umsatz'].sum()), 2),
-                'avg_umsatz': round(float(nicht_dach_kunden['gesamt_umsatz'].mean()), 2)
-            })
+        for ist_dach, label in [(True, 'Ja'), (False, 'Nein')]:
+            stats = dach_stats.get(ist_dach)
+            if stats:
+                report_dach.append({
+                    'ist_dach_kunde': label,
+                    'anzahl_kunden': float(stats['anzahl_kunden']),
+                    'gesamt_umsatz': round(stats['gesamt_umsatz'], 2),
+                    'avg_umsatz': round(stats['avg_umsatz'], 2)
+                })
 
-        # Länder-Details
-        laender_stats = df.group_by('country').agg([
-            pl.col('transaction_id').count().alias('anzahl_bestellungen'),
-            pl.col('total').sum().alias('gesamt_umsatz'),
-            pl.col('total').mean().alias('avg_bestellung')
-        ]).sort('gesamt_umsatz', descending=True)
-
-        for row in laender_stats.iter_rows(named=True):
-            land_data = {
-                'country': row['country'],
-                'anzahl_bestellungen': float(row['anzahl_bestellungen']),
-                'gesamt_umsatz': round(float(row['gesamt_umsatz']), 2),
-                'avg_bestellung': round(float(row['avg_bestellung']), 2)
-            }
-
-            if row['country'] in DACH_COUNTRIES:
-                report_dach_laender.append(land_data)
-                print(f"[ANALYZER]   DACH - {row['country']}: {row['anzahl_bestellungen']} Bestellungen")
-            else:
-                report_andere_laender.append(land_data)
-                print(f"[ANALYZER]   Andere - {row['country']}: {row['anzahl_bestellungen']} Bestellungen")
+        for ist_dach, report, label in [(True, report_dach_laender, 'DACH'), (False, report_andere_laender, 'Andere')]:
+            for row in laender_stats.filter(pl.col('is_dach') == ist_dach).to_dicts():
+                report.append({
+                    'country': row['country'],
+                    'anzahl_bestellungen': float(row['anzahl_bestellungen']),
+                    'gesamt_umsatz': round(row['gesamt_umsatz'], 2),
+                    'avg_bestellung': round(row['avg_bestellung'], 2)
+                })
+                print(f"[ANALYZER]   {label} - {row['country']}: {row['anzahl_bestellungen']} Bestellungen")
 
     else:
         print(f"[WARN] Spalte 'country' nicht gefunden - DACH-Analyse übersprungen")
@@ -243,34 +424,31 @@ def analyze_csv(csv_path, output_path='data.json'):
 
     try:
         # VIPs = Top 10% (90. Perzentil) - gleiche Schwelle wie oben
-        vip_kunden = kunden_umsatz.filter(pl.col('gesamt_umsatz') >= vip_threshold)
-
-        if len(kunden_last_order) > 0 and len(vip_kunden) > 0:
-            # VIPs mit Inaktivitäts-Info joinen
-            vip_mit_datum = vip_kunden.join(kunden_last_order, on='customer_id', how='left')
-
-            # Inaktive VIPs (> 30 Tage) - TOP 30
-            inaktive_vips = vip_mit_datum.filter(
-                pl.col('tage_inaktiv') > 30
-            ).sort('gesamt_umsatz', descending=True).head(30)
-
-            inaktive_vips_count = len(vip_mit_datum.filter(pl.col('tage_inaktiv') > 30))
-            verlorener_umsatz_total = float(vip_mit_datum.filter(pl.col('tage_inaktiv') > 30)['gesamt_umsatz'].sum())
-
-            for row in inaktive_vips.iter_rows(named=True):
-                letzte_bestellung = row['letzte_bestellung']
-                if letzte_bestellung is not None:
-                    letzte_bestellung_str = letzte_bestellung.strftime('%Y-%m-%d')
-                else:
-                    letzte_bestellung_str = 'Unbekannt'
-
-                top_inaktive_vips.append({
-                    'customer_id': float(row['customer_id']),
-                    'gesamt_umsatz': round(float(row['gesamt_umsatz']), 2),
-                    'anzahl_bestellungen': float(row['anzahl_bestellungen']),
-                    'letzte_bestellung': letzte_bestellung_str,
-                    'tage_inaktiv': float(row['tage_inaktiv']) if row['tage_inaktiv'] is not None else 0
-                })
+        vip_mit_datum = kunden_umsatz.filter(pl.col('umsatz_segment') == 'VIP')
+
+        if 'tage_inaktiv' in vip_mit_datum.columns and len(vip_mit_datum) > 0:
+            # Inaktive VIPs (> 30 Tage) - einmal filtern, dann wiederverwenden
+            inaktive_vips_all = vip_mit_datum.filter(pl.col('tage_inaktiv') > 30)
+
+            inaktive_vips_count = len(inaktive_vips_all)
+            verlorener_umsatz_total = inaktive_vips_all['gesamt_umsatz'].sum()
+
+            # TOP 30 (Teilsortierung per top_k, danach nur die 30 Zeilen sortieren)
+            inaktive_vips = inaktive_vips_all.top_k(30, by='gesamt_umsatz').sort('gesamt_umsatz', descending=True)
+
+            # Zeilen komplett in Polars aufbereiten (Casts, Runden, Datum) - keine Python-Schleife
+            # Numerische IDs wie bisher als Zahl, Text-IDs unverändert
+            customer_id = pl.col('customer_id')
+            if inaktive_vips.schema['customer_id'].is_numeric():
+                customer_id = customer_id.cast(pl.Float64)
+
+            top_inaktive_vips = inaktive_vips.select([
+                customer_id,
+                pl.col('gesamt_umsatz').round(2),
+                pl.col('anzahl_bestellungen').cast(pl.Float64),
+                pl.col('letzte_bestellung').dt.strftime('%Y-%m-%d').fill_null('Unbekannt'),
+                pl.col('tage_inaktiv').fill_null(0).cast(pl.Float64)
+            ]).to_dicts()
 
             print(f"[ANALYZER] Inaktive VIPs gefunden: {inaktive_vips_count}")
             print(f"[ANALYZER] Verlorener Umsatz: {verlorener_umsatz_total:,.2f} EUR")
@@ -303,32 +481,36 @@ def analyze_csv(csv_path, output_path='data.json'):
     # ============================================
     # SPEICHERN
     # ============================================
-    print(f"[ANALYZER] Speichere Ergebnisse nach: {output_path}")
+    if output_path is not None:
+        print(f"[ANALYZER] Speichere Ergebnisse nach: {output_path}")
 
-    output_dir = os.path.dirname(output_path)
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir, exist_ok=True)
+        output_dir = os.path.dirname(output_path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(dashboard_data, f, ensure_ascii=False, indent=2)
+        with open(output_path, 'wb') as f:
+            output_size = write_json_sections(f, dashboard_data)
 
-    if os.path.exists(output_path):
-        output_size = os.path.getsize(output_path)
         print(f"[ANALYZER] ✅ Erfolgreich gespeichert: {output_path} ({output_size} bytes)")
-    else:
-        print(f"[ERROR] Datei wurde nicht erstellt: {output_path}")
-        sys.exit(1)
 
     print(f"[ANALYZER] Ende: {datetime.now().isoformat()}")
     return dashboard_data
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python simple_analyzer.py <csv_path> [output_path]")
+    # --cache: geparste CSV als Arrow-IPC neben der Datei ablegen/wiederverwenden
+    args = [arg for arg in sys.argv[1:] if arg != '--cache']
+    use_cache = len(args) != len(sys.argv) - 1
+
+    if len(args) < 1:
+        print("Usage: python simple_analyzer.py [--cache] <csv_path> [output_path]")
         sys.exit(1)
 
-    csv_path = sys.argv[1]
-    output_path = sys.argv[2] if len(sys.argv) > 2 else 'data.json'
+    csv_path = args[0]
+    output_path = args[1] if len(args) > 1 else 'data.json'
 
-    analyze_csv(csv_path, output_path)
\ No newline at end of file
+    try:
+        analyze_csv(csv_path, output_path, cache=use_cache)
+    except Exception as e:
+        print(f"[ERROR] Analyse fehlgeschlagen: {e}")
+        sys.exit(1)
\ No newline at end of file
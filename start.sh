@@ -2,4 +2,4 @@
 # Start Script für Railway
 
 # Virtual Environment aktivieren und Gunicorn starten
-/opt/venv/bin/gunicorn --bind 0.0.0.0:$PORT --timeout 1800 --workers 2 --worker-class sync backend_server:app
+/opt/venv/bin/gunicorn --bind 0.0.0.0:$PORT --timeout 700 --workers 2 --threads 4 --worker-class gthread backend_server:app
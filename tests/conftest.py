@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Module liegen im Repo-Root (kein Paket)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -0,0 +1,179 @@
+import io
+import os
+import time
+
+import orjson
+import pytest
+
+import backend_server
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    assets = tmp_path / 'assets'
+    assets.mkdir()
+    (assets / 'index-BxY3z9Ab.js').write_text('console.log(1)')
+    (tmp_path / 'favicon.svg').write_text('<svg/>')
+    monkeypatch.setattr(backend_server.app, 'static_folder', str(tmp_path))
+    return backend_server.app.test_client()
+
+
+def test_hashed_asset_cached_for_a_year(client):
+    response = client.get('/assets/index-BxY3z9Ab.js')
+
+    assert response.status_code == 200
+    assert response.cache_control.max_age == backend_server.ASSET_MAX_AGE
+    assert response.cache_control.public
+
+
+def test_unhashed_file_revalidated(client):
+    response = client.get('/favicon.svg')
+
+    assert response.status_code == 200
+    assert response.cache_control.no_cache
+
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    uploads = tmp_path / 'uploads'
+    jobs = tmp_path / 'jobs'
+    uploads.mkdir()
+    jobs.mkdir()
+    monkeypatch.setattr(backend_server, 'UPLOAD_FOLDER_PATH', str(uploads))
+    monkeypatch.setattr(backend_server, 'JOBS_FOLDER_PATH', str(jobs))
+    monkeypatch.setattr(backend_server, 'DATA_FILE_PATH', str(tmp_path / 'data.json'))
+    return uploads, jobs
+
+
+def set_age(path, seconds):
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_orphaned_job_reported_as_error(folders, monkeypatch):
+    uploads, _ = folders
+    job_id = 'a' * 32
+    (uploads / f'{job_id}.csv').write_text('customer_id\n')
+    monkeypatch.setattr(backend_server, 'SERVER_STARTED_AT', time.time() + 60)
+
+    backend_server.mark_orphaned_jobs()
+    response = backend_server.app.test_client().get(f'/api/jobs/{job_id}')
+
+    assert not (uploads / f'{job_id}.csv').exists()
+    assert response.get_json()['status'] == 'error'
+
+
+def test_prune_jobs_removes_old_files(folders):
+    _, jobs = folders
+    old_file = jobs / f'{"b" * 32}.json'
+    new_file = jobs / f'{"c" * 32}.json'
+    old_file.write_text('{}')
+    new_file.write_text('{}')
+    set_age(old_file, backend_server.JOB_RETENTION_SECONDS + 60)
+
+    backend_server.prune_jobs()
+
+    assert not old_file.exists()
+    assert new_file.exists()
+
+
+def test_prune_jobs_expires_uploads_past_deadline(folders):
+    uploads, jobs = folders
+    stale_csv = uploads / f'{"d" * 32}.csv'
+    stale_part = uploads / 'tmpabc.part'
+    running_csv = uploads / f'{"e" * 32}.csv'
+    for path in (stale_csv, stale_part, running_csv):
+        path.write_text('customer_id\n')
+    age = backend_server.ANALYSE_TIMEOUT_SECONDS + backend_server.UPLOAD_CLEANUP_GRACE_SECONDS + 60
+    set_age(stale_csv, age)
+    set_age(stale_part, age)
+
+    backend_server.prune_jobs()
+
+    assert not stale_csv.exists()
+    assert not stale_part.exists()
+    assert running_csv.exists()
+    assert (jobs / f'{"d" * 32}.error').read_text() == backend_server.JOB_TIMEOUT_MESSAGE
+
+
+CSV_TEXT = """customer_id,transaction_id,total,date,country
+1,1,100.50,2024-01-01,Germany
+2,2,50.00,2024-02-15,France
+"""
+
+
+def upload(client, text, filename='orders.csv'):
+    return client.post(
+        '/api/upload-csv',
+        data={'file': (io.BytesIO(text.encode()), filename)},
+        content_type='multipart/form-data'
+    )
+
+
+def wait_for_job(client, job_id, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        body = client.get(f'/api/jobs/{job_id}').get_json()
+        if body['status'] != 'running':
+            return body
+        time.sleep(0.2)
+    raise AssertionError(f'Job {job_id} läuft noch nach {timeout}s')
+
+
+def test_upload_runs_job_and_publishes_data(folders):
+    uploads, _ = folders
+    data_file = uploads.parent / 'data.json'
+    data_file.write_text('{}')
+    client = backend_server.app.test_client()
+
+    response = upload(client, CSV_TEXT)
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    body = wait_for_job(client, job_id)
+
+    assert body['status'] == 'done'
+    assert body['data']['kundenGesamt'] == 2
+    assert orjson.loads(data_file.read_bytes())['kundenGesamt'] == 2
+    assert not (uploads / f'{job_id}.csv').exists()
+
+
+def test_upload_with_invalid_csv_reports_error(folders):
+    uploads, _ = folders
+    client = backend_server.app.test_client()
+
+    response = upload(client, 'foo,bar\n1,2\n')
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    body = wait_for_job(client, job_id)
+
+    assert body['status'] == 'error'
+    assert 'Fehlende Spalten' in body['details']
+    assert not (uploads / f'{job_id}.csv').exists()
+
+
+@pytest.mark.parametrize('suffix', ['', ':br', ':gzip'])
+def test_data_not_modified_for_matching_etag(folders, suffix):
+    uploads, _ = folders
+    (uploads.parent / 'data.json').write_text('{"kundenGesamt": 2}')
+    client = backend_server.app.test_client()
+
+    first = client.get('/api/data')
+    etag, _ = first.get_etag()
+    second = client.get('/api/data', headers={'If-None-Match': f'"{etag}{suffix}"'})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+
+
+def test_oversized_upload_returns_413(folders, monkeypatch):
+    uploads, _ = folders
+    monkeypatch.setitem(backend_server.app.config, 'MAX_CONTENT_LENGTH', 1024)
+    client = backend_server.app.test_client()
+
+    response = upload(client, CSV_TEXT * 100)
+
+    assert response.status_code == 413
+    assert 'error' in response.get_json()
+    assert not list(uploads.glob('*.csv'))
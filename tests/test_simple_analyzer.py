@@ -0,0 +1,62 @@
+import io
+import os
+
+from simple_analyzer import analyze_csv, parsed_cache_path
+
+CSV_TEXT = """customer_id,transaction_id,total,date,country
+1,1,100.50,2024-01-01,Germany
+1,2,200.25,2024-03-01,Germany
+2,3,50.00,2024-02-15,France
+3,4,1500.00,2023-10-01,Austria
+"""
+
+
+def test_analyze_bytesio_source():
+    data = analyze_csv(io.BytesIO(CSV_TEXT.encode()), None)
+
+    assert data['kundenGesamt'] == 3
+    assert data['maxDate'] == '2024-03-01'
+    assert round(sum(seg['segment_umsatz'] for seg in data['reportUmsatz']), 2) == 1850.75
+    assert {row['country'] for row in data['reportDachLaender']} == {'Germany', 'Austria'}
+
+
+def test_totals_keep_cent_precision():
+    csv_text = "customer_id,transaction_id,total,date\n1,1,123456789.37,2024-01-01\n"
+    data = analyze_csv(io.BytesIO(csv_text.encode()), None)
+
+    assert [seg['segment_umsatz'] for seg in data['reportUmsatz'] if seg['anzahl_kunden']] == [123456789.37]
+
+
+def test_text_ids_fall_back_to_utf8():
+    csv_text = CSV_TEXT.replace('\n1,', '\nC001,').replace('\n2,', '\nC002,').replace('\n3,', '\nC003,')
+    data = analyze_csv(io.BytesIO(csv_text.encode()), None)
+
+    assert data['kundenGesamt'] == 3
+    assert data['reportAktivitaet']
+    assert all(isinstance(vip['customer_id'], str) for vip in data['topInaktiveVips'])
+
+
+def test_cache_replaces_outdated_cache_files(tmp_path):
+    csv_path = tmp_path / 'orders.csv'
+    csv_path.write_text(CSV_TEXT)
+    stale = tmp_path / 'orders.csv.1-2.arrow'
+    stale.write_bytes(b'')
+
+    analyze_csv(str(csv_path), None, cache=True)
+
+    assert not stale.exists()
+    assert [p.name for p in tmp_path.glob('orders.csv.*')] == [os.path.basename(parsed_cache_path(str(csv_path)))]
+
+
+def test_only_failing_id_column_is_widened():
+    csv_text = (
+        "customer_id,transaction_id,total,date\n"
+        "3000000000,T1,100.0,2024-01-01\n"
+        "1,T2,5000.0,2023-01-01\n"
+    )
+    data = analyze_csv(io.BytesIO(csv_text.encode()), None)
+
+    assert data['kundenGesamt'] == 2
+    assert sum(seg['anzahl_kunden'] for seg in data['reportUmsatz']) == 2
+    assert [vip['customer_id'] for vip in data['topInaktiveVips']] == [1.0]
+    assert data['topInaktiveVips'][0]['anzahl_bestellungen'] == 1.0